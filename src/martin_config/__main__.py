@@ -3,17 +3,20 @@ import asyncio
 import logging
 import argparse
 import sys
-from martin_config import utils, config
+import json
+import importlib
+import concurrent.futures
+import yaml
+from martin_config import utils, config, db
 from dotenv import dotenv_values
 
+LOG_FORMATTER = logging.Formatter('%(asctime)s-%(filename)s:%(funcName)s:%(lineno)d:%(levelname)s:%(message)s',
+                                  "%Y-%m-%d %H:%M:%S")
 
 
 def main():
-    logging.basicConfig()
     sthandler = logging.StreamHandler()
-    sthandler.setFormatter(
-        logging.Formatter('%(asctime)s-%(filename)s:%(funcName)s:%(lineno)d:%(levelname)s:%(message)s',
-                          "%Y-%m-%d %H:%M:%S"))
+    sthandler.setFormatter(LOG_FORMATTER)
     logger = logging.getLogger()
     # remove the default stream handler and add the new one too it.
     logger.handlers.clear()
@@ -25,13 +28,13 @@ def main():
 
 
 
-    logger.name = os.path.split(__file__)[-1]
+    logger.name = os.path.basename(__file__)
 
     parser = argparse.ArgumentParser(description='Create a config file for martin vector tile server')
 
     parser.add_argument('-s', '--database-schema',
                             help='A list of schema names. If no schema is specified all schemas are used.',
-                            type=str, nargs='+', )
+                            type=lambda s: s.split(','), nargs='+', )
     parser.add_argument('-u', '--database-user',
                             help='The user for which the config will be created',
                             type=str, required=True )
@@ -49,21 +52,27 @@ def main():
     parser.add_argument('-sfs', '--skip-function-sources',  action='store_true',
                         help='Do not create  config for function sources'
                         )
+    parser.add_argument('-j', '--json', action='store_true',
+                        help='Write the config as compact JSON (valid YAML) instead of YAML'
+                        )
 
     args = parser.parse_args(args=None if sys.argv[1:] else ['--help'])
 
     schemas = args.database_schema
     if schemas:
-        schemas = set(schemas[0].split(',') if ',' in schemas[0] else schemas)
+        schemas = {schema for group in schemas for schema in group if schema}
     for_user = args.database_user
     config_file = args.out_cfg_file
     skip_function_sources = args.skip_function_sources
+    as_json = args.json
     debug = args.debug
     if debug:
         logger.debug('Setting log level to DEBUG')
         logger.setLevel(logging.DEBUG)
     else:
         logger.setLevel(logging.INFO)
+    if not yaml.__with_libyaml__:
+        logger.warning('PyYAML was built without libyaml, the config will be serialized by the slow pure Python emitter')
 
 
     signed_azure_file_share_url = os.environ.get('AZURE_FILESHARE_SASURL', None)
@@ -71,7 +80,7 @@ def main():
 
     env_file = args.env_file
 
-    if env_file:
+    if env_file and (signed_azure_file_share_url is None or dsn is None):
         assert os.path.exists(env_file), f'.env file {env_file} does not exist'
         assert os.path.getsize(env_file) > 0, f'.env file {env_file} is empty'
         env_dict = dotenv_values(env_file)
@@ -80,36 +89,68 @@ def main():
         if dsn is None:
             dsn = env_dict.get('POSTGRES_DSN', None)
 
-    assert config_file not in [None, ''], f'config_file={config_file} is invalid'
-
 
     assert dsn is not None, f'Invalid POSTGRES_DSN={dsn}. Set env variable POSTGRES_DSN to a valid Postgres ' \
                             f'connection string.'
 
-    general_config = config.create_general_config()
-
-    schemas_config = asyncio.run(config.create_config_dict(
-        dsn=dsn,
-        for_user=for_user,
-        schemas=schemas,
-        skip_function_sources=skip_function_sources
-    ))
-
-    general_config.update(schemas_config or {})
-
-    yaml_config = utils.dump(general_config)
-    logger.info(f'Writing config to {config_file}')
-    with open(config_file, 'w+') as f:
-        f.write(yaml_config)
-
+    upload_executor = None
+    if signed_azure_file_share_url and config_file:
+        # the Azure SDK is slow to import, load it in the background while the database is introspected
+        upload_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        azfile_module = upload_executor.submit(importlib.import_module, 'martin_config.azfile')
+
+    try:
+        general_config = config.create_general_config()
+
+        try:
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        except ImportError:
+            pass
+
+        async def create_schemas_config():
+            try:
+                return await config.create_config_dict(
+                    dsn=dsn,
+                    for_user=for_user,
+                    schemas=schemas,
+                    skip_function_sources=skip_function_sources
+                )
+            finally:
+                await db.close_pools()
+
+        schemas_config = asyncio.run(create_schemas_config())
+
+        general_config.update(schemas_config or {})
+
+        if not config_file:
+            if as_json:
+                json.dump(general_config, sys.stdout, separators=(',', ':'))
+            else:
+                utils.dump(general_config, stream=sys.stdout)
+            return
+
+        logger.info('Writing config to %s', config_file)
+        with open(config_file, 'w+') as f:
+            if as_json:
+                json.dump(general_config, f, separators=(',', ':'))
+            else:
+                utils.dump(general_config, stream=f)
+
+            if upload_executor is not None:
+                logger.info(f'Uploading cfg file to Azure File Share')
+                # upload from the handle that was just written instead of reopening the file
+                f.seek(0)
+                azfile_module.result().upload_cfg_file(
+                    sas_url=signed_azure_file_share_url,
+                    cfg_file_path=config_file,
+                    data_stream=f.buffer
+                )
+    finally:
+        # also shut the executor down when generating or writing the config fails
+        if upload_executor is not None:
+            upload_executor.shutdown(wait=True)
 
-    if signed_azure_file_share_url:
-        from martin_config.azfile import upload_cfg_file
-        logger.info(f'Uploading cfg file to Azure File Share')
-        upload_cfg_file(
-            sas_url=signed_azure_file_share_url,
-            cfg_file_path=config_file,
-        )
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
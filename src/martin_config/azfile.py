@@ -1,14 +1,28 @@
 import os
+import functools
 from urllib.parse import urlparse
 from azure.storage.fileshare import ShareDirectoryClient
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+@functools.lru_cache(maxsize=8)
+def parse_sas_url(sas_url=None):
+    """
+    Parse a SAS URL. The result is memoized as the same URL is used for every upload
+    :param sas_url: str, the file share  SAS URL
+    :return: urllib.parse.ParseResult
+    """
+    return urlparse(sas_url)
+
+
 def upload_cfg_file(
         sas_url=None,
         cfg_file_path=None,
-        file_name=None
+        file_name=None,
+        max_concurrency=4,
+        data_stream=None
 ):
     """
     Upload the config file to an Azure file share
@@ -16,21 +30,29 @@ def upload_cfg_file(
             used to authenticate te requests and needs to have RWLC rights
     :param cfg_file_path: str, abs path to a file to be uploaded
     :param file_name:the name of the destination file
+    :param max_concurrency: int, the number of ranges uploaded in parallel
+    :param data_stream: binary file like object positioned at the start of the content of cfg_file_path, optional.
+            When supplied it is uploaded instead of opening cfg_file_path again
     :return:
 
     """
 
-    parsed = urlparse(sas_url)
+    parsed = parse_sas_url(sas_url=sas_url)
     assert cfg_file_path not in ('', None), f'Invalid config_file_path={cfg_file_path}'
     assert os.path.exists(cfg_file_path), f'cfg_file_path does not exist on local file system'
 
     if file_name is None:
-        file_name = os.path.split(cfg_file_path)[-1]
+        file_name = os.path.basename(cfg_file_path)
 
     with ShareDirectoryClient.from_directory_url(directory_url=sas_url) as sdc:
-        with open(cfg_file_path, 'rb') as src:
-            sdc.upload_file(file_name=file_name, data=src)
-            logger.info(f'{file_name} was uploaded to {parsed.scheme}//{parsed.netloc}{parsed.path}')
+        if data_stream is None:
+            with open(cfg_file_path, 'rb') as src:
+                sdc.upload_file(file_name=file_name, data=src, length=os.path.getsize(cfg_file_path),
+                                max_concurrency=max_concurrency)
+        else:
+            sdc.upload_file(file_name=file_name, data=data_stream, length=os.path.getsize(cfg_file_path),
+                            max_concurrency=max_concurrency)
+        logger.info('%s was uploaded to %s//%s%s', file_name, parsed.scheme, parsed.netloc, parsed.path)
 
 
 
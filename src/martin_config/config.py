@@ -1,21 +1,144 @@
 from martin_config import utils, db
 import logging
-import asyncpg
+import asyncio
 logger = logging.getLogger(__name__)
-async def create_config_dict(dsn=None, schemas=None, for_user=None, skip_function_sources=False, **conn_dict):
+
+
+async def create_schema_config(pool=None, schema=None, for_user=None, skip_function_sources=False, semaphore=None):
+    """
+    Create the configuration for the table sources and function sources located in one schema.
+    The table sources and function sources are created concurrently.
+    The tables of the schema are introspected with one query. If that query fails the tables are
+    processed concurrently, each on a connection acquired from the supplied pool.
+    :param pool: instance of asyncpg.Pool
+    :param schema: str, the name of the schema
+    :param for_user: str, the user for which the config is created
+    :param skip_function_sources, bool, if True not config will be generated for the function sources
+    :param semaphore: instance of asyncio.BoundedSemaphore, optional, caps the number of connections used at the same
+            time. Share one between schemas that run concurrently on the same pool
+    :return: a tuple of two dicts with the config for the table sources and function sources
+    """
+    assert pool is not None, f'Invalid pool={pool}'
+    assert schema not in ('', None), f'Invalid schema={schema}'
+    if semaphore is None:
+        semaphore = asyncio.BoundedSemaphore(pool.get_max_size())
+
+    if for_user:
+        async with semaphore, pool.acquire(timeout=utils.CONNECTION_TIMEOUT) as conn_obj:
+            logger.debug(f'Checking if user {for_user} has usage privilege on {schema}')
+            if not await db.schema_is_accessible(conn_obj=conn_obj, schema=schema, user=for_user):
+                logger.info(f'User {for_user} has not been granted USAGE privilege on schema {schema}')
+                return {}, {}
+
+    async def process_table(table=None):
+        # every table runs on its own pooled connection so the round-trips of the tables overlap
+        # waiting happens on the semaphore so queued tables do not run into the acquire timeout
+        # the table and column privileges of for_user come with the table info
+        async with semaphore, pool.acquire(timeout=utils.CONNECTION_TIMEOUT) as table_conn:
+            return await db.get_table_cfg(conn_obj=table_conn, user=for_user, table=table)
+
+    async def create_tables_config():
+        tables_cfg = {}
+        async with semaphore, pool.acquire(timeout=utils.CONNECTION_TIMEOUT) as conn_obj:
+            try:
+                records = await db.introspect_schema(conn_obj=conn_obj, schema=schema, user=for_user)
+            except Exception as e:
+                # ex. the extent of a table can not be estimated, a single failing table fails the whole query
+                logger.warning(f'Failed to introspect schema {schema} because {e}. Processing the tables one by one')
+                records = None
+                tables = []
+                tasks = []
+                try:
+                    async for table, comment in db.iter_tables(conn_obj=conn_obj, schema=schema):
+                        # old mode, will be deprecated
+                        # the table comments come with the table names so unpublished tables cost no round-trip
+                        if not for_user and not db.publish_flag(comment):
+                            logger.info(
+                                f'{table} was marked as not publishable and will be skipped')
+                            continue
+                        tables.append(table)
+                        # the table is processed while the remaining ones are still being fetched
+                        tasks.append(asyncio.ensure_future(process_table(table=table)))
+                except BaseException:
+                    for task in tasks:
+                        task.cancel()
+                    raise
+        if records is not None:
+            for record in records:
+                table = f'{schema}.{record["table_name"]}'
+                if for_user:
+                    will_publish = record['table_accessible']
+                    col_privileges = db.load_json(record['column_privileges']) or {}
+                else: # old mode, will be deprecated
+                    will_publish = db.publish_flag(record['table_comment']) or False
+                    col_privileges = None
+                if will_publish == False:
+                    logger.info(
+                        f'{table} was marked as not publishable and will be skipped')
+                    continue
+                logger.info(f'Creating configuration for {table}')
+                tables_cfg[table] = db.build_table_cfg(table=table, record=record, col_privileges=col_privileges)
+        else:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            for table, table_cfg in zip(tables, results):
+                if isinstance(table_cfg, Exception):
+                    logger.error(f'Failed to create config for table {table} because {table_cfg}. Skipping...')
+                    continue
+                if table_cfg:
+                    tables_cfg.update(table_cfg)
+        return tables_cfg
+
+    async def create_functions_config():
+        funcs_cfg = {}
+        if skip_function_sources is not False:
+            return funcs_cfg
+        async with semaphore, pool.acquire(timeout=utils.CONNECTION_TIMEOUT) as conn_obj:
+            # the execute privileges of the user come with the functions
+            funcs = await db.list_function_sources(conn_obj=conn_obj, schema=schema, user=for_user)
+        if funcs:
+            logger.info(f'Creating config for {len(funcs)} function source(s)...')
+            for func_rec in funcs:
+                func_name = f'{func_rec["function_schema"]}.{func_rec["function_name"]}'
+                if for_user and not func_rec['executable']:
+                    logger.info(f'user {for_user} was not granted execute privilege for function {func_name}')
+                    continue
+                funcs_cfg[func_name] = {
+                    'id': func_name,
+                    'schema': func_rec['function_schema'],
+                    'function': func_rec['function_name'],
+                    'minzoom': 0,
+                    'maxzoom': 22,
+                    'bounds': [-180.0, -90.0, 180.0, 90.0],
+                }
+        return funcs_cfg
+
+    tables_cfg, funcs_cfg = await asyncio.gather(create_tables_config(), create_functions_config())
+    return tables_cfg, funcs_cfg
+
+
+async def create_config_dict(dsn=None, schemas=None, for_user=None, skip_function_sources=False, pool=None, **conn_dict):
     """
     Create a configuration dictionary for all table sources in a postgis database.
     If schema is provided the config is generated for the given schema
     :param dsn, str, a Postgres dsn  connection string
     :param schemas: iter of strings representing schemas in db
     :param skip_function_sources, bool, if True not config will be generated for the function sources
+    :param pool: instance of asyncpg.Pool, optional. If supplied all queries run on its connections
+            and dsn/conn_dict are not used
     :param conn_dict, dict, a dict with items containing  info  necessary to connect to a Postgres server
     :return: a dictionary with configuration for  tables sources and function sources
+    NB when no pool is supplied the connection pool is shared through db.get_pool() and needs
+    to be closed with db.close_pools()
     """
-
-    if conn_dict and not dsn:
-        dsn = utils.cd2s(**conn_dict)
-    assert dsn not in ('', None), f'Invalid dsn={dsn}'
+    if pool is None:
+        if conn_dict and not dsn:
+            dsn = utils.cd2s(**conn_dict)
+        assert dsn not in ('', None), f'Invalid dsn={dsn}'
+        logger.debug('Connecting to database...')
+        pool_size = await db.get_pool_size(dsn=dsn)
+        logger.info(f'Using a pool of {pool_size} connections')
+        # the tables are processed concurrently right away so all the connections are opened upfront
+        pool = await db.get_pool(dsn=dsn, min_size=pool_size, max_size=pool_size)
 
     schemas_cfg = {}
     if schemas:
@@ -25,78 +148,46 @@ async def create_config_dict(dsn=None, schemas=None, for_user=None, skip_functio
         logger.info(
             f'Creating config for tables in all available schemas ...')
     funcs_cfg = {}
-    async with asyncpg.create_pool(dsn=dsn, min_size=utils.POOL_MINSIZE, max_size=utils.POOL_MAXSIZE,
-                                   command_timeout=utils.POOL_COMMAND_TIMEOUT, ) as pool:
-        logger.debug('Connecting to database...')
-        async with pool.acquire(timeout=utils.CONNECTION_TIMEOUT) as conn_obj:
-            available_schemas = await db.list_schemas(conn_obj=conn_obj)
-            #available_schemas = set(available_schemas) - set(['public'])
-            if not schemas:
-                schemas = available_schemas
-            for schema in schemas:
-                if for_user:
-                    logger.debug(f'Checking if user {for_user} has usage privilege on {schema}')
-                    if not await db.schema_is_accessible(conn_obj=conn_obj, schema=schema, user=for_user):
-                        logger.info(f'User {for_user} has not been granted USAGE privilege on schema {schema}')
-                        continue
-                logger.debug(f'Checking if schema {schema} exists')
-                if not schema in available_schemas:
-                    logger.warning(f'Schema "{schema}" does not exist in {dsn}.'
-                                   f'Valid options are: {",".join(available_schemas)}')
-                    continue
-                else:
-                    for table in await db.list_tables(conn_obj=conn_obj, schema=schema):
-                        try:
-                            if for_user:
-                                will_publish = await db.table_is_accessible(conn_obj=conn_obj, table=table, user=for_user)
-                            else: # old mode, will be deprecated
-                                will_publish = await db.table_is_publishable(table=table, conn_obj=conn_obj)
-                        except Exception as ee:
-                            logger.error(
-                                f'Failed to fetch comments for table {table} because {ee}. Skipping...')
-                            continue
-                        if will_publish == False:
-                            logger.info(
-                                f'{table} was marked as not publishable and will be skipped')
-                            continue
-                        table_cfg = await db.get_table_cfg(conn_obj=conn_obj, user=for_user, table=table)
-                        if table_cfg:
-                            schemas_cfg.update(table_cfg)
-
-                    if skip_function_sources is False:
-                        funcs = await db.list_function_sources(conn_obj=conn_obj, schema=schema)
-                        if funcs:
-                            logger.info(f'Creating config for {len(funcs)} function source(s)...')
-                            for func_rec in funcs:
-                                func_name = f'{func_rec["function_schema"]}.{func_rec["function_name"]}'
-                                if for_user:
-                                    is_publishable = await db.function_is_publishable(
-                                        conn_obj=conn_obj,user=for_user,function_name=func_rec['function_name'],
-                                        schema=func_rec['function_schema']
-                                    )
-                                    if not is_publishable:
-                                        logger.info(f'user {for_user} was not granted execute privilege for function {func_name}')
-                                        continue
-                                funcs_cfg[f'{func_name}:'] = {
-                                    'id': func_name,
-                                    'schema': func_rec['function_schema'],
-                                    'function': func_rec['function_name'],
-                                    'minzoom': 0,
-                                    'maxzoom': 22,
-                                    'bounds': [-180.0, -90.0, 180.0, 90.0],
-                                }
+    async with pool.acquire(timeout=utils.CONNECTION_TIMEOUT) as conn_obj:
+        available_schemas = await db.list_schemas(conn_obj=conn_obj)
+    if not schemas:
+        schemas = available_schemas
+    available_set = frozenset(available_schemas)
+    valid_schemas = []
+    for schema in schemas:
+        logger.debug(f'Checking if schema {schema} exists')
+        if not schema in available_set:
+            logger.warning(f'Schema "{schema}" does not exist in {dsn or "the database"}.'
+                           f'Valid options are: {",".join(available_schemas)}')
+            continue
+        valid_schemas.append(schema)
+    # the schemas and their tables run concurrently, the shared semaphore caps the connections in use
+    # at the real capacity of the pool
+    semaphore = asyncio.BoundedSemaphore(pool.get_max_size())
+    results = await asyncio.gather(*[
+        create_schema_config(
+            pool=pool,
+            schema=schema,
+            for_user=for_user,
+            skip_function_sources=skip_function_sources,
+            semaphore=semaphore
+        ) for schema in valid_schemas
+    ])
+    for schema_tables_cfg, schema_funcs_cfg in results:
+        schemas_cfg.update(schema_tables_cfg)
+        funcs_cfg.update(schema_funcs_cfg)
 
     if schemas_cfg and funcs_cfg:
 
-        return {'table_sources:': schemas_cfg, 'function_sources:': funcs_cfg }
+        return {'table_sources': schemas_cfg, 'function_sources': funcs_cfg }
     if schemas_cfg and not funcs_cfg:
-        return  {'table_sources:': schemas_cfg}
+        return  {'table_sources': schemas_cfg}
     if funcs_cfg and not schemas_cfg:
-        return  {'function_sources:': funcs_cfg}
+        return  {'function_sources': funcs_cfg}
 
 
-def create_general_config(listen_addresses="'0.0.0.0:3000'", connection_string="'$DATABASE_URL'",
-                          pool_size=20, keep_alive=75, woker_processes=8, watch=False,
+def create_general_config(listen_addresses='0.0.0.0:3000', connection_string='$DATABASE_URL',
+                          pool_size=20, keep_alive=75, worker_processes=8, watch=False,
                           danger_accept_invalid_certs=True,
                           ):
     """
@@ -105,10 +196,18 @@ def create_general_config(listen_addresses="'0.0.0.0:3000'", connection_string="
     :param connection_string: Database connection string, bind to  env variable '$DATABASE_URL'
     :param pool_size: Maximum connections pool size [default: 20]
     :param keep_alive: Connection keep alive timeout [default: 75]
-    :param woker_processes: Number of web server workers [default 8]
+    :param worker_processes: Number of web server workers [default 8]
     :param watch: Enable watch mode, default False
     :param danger_accept_invalid_certs: Trust invalid certificates. This introduces significant vulnerabilities, and
             should only be used as a last resort. default True
     :return: dict
     """
-    return locals()
+    return {
+        'listen_addresses': listen_addresses,
+        'connection_string': connection_string,
+        'pool_size': pool_size,
+        'keep_alive': keep_alive,
+        'worker_processes': worker_processes,
+        'watch': watch,
+        'danger_accept_invalid_certs': danger_accept_invalid_certs,
+    }
@@ -1,34 +1,347 @@
+import asyncio
 import asyncpg
+import functools
+import inspect
 import logging
+import weakref
+from collections import OrderedDict
 from martin_config import utils
-from urllib.parse import urlencode
+from urllib.parse import parse_qsl, unquote_plus, urlencode
 import json
 
-try:
-    import urlparse
-except ImportError:
-    import urllib.parse as urlparse
-
 logger = logging.getLogger(__name__)
 
-ALLOWED_METHODS = 'execute', 'fetch', 'fetchval', 'fetchrow'
+# values of the publish keyword in comments that mark a table/column as publishable
+TRUTHY_VALUES = frozenset(('true', '1', 'yes', 't', 'on'))
+
+# connection pools shared by all callers, keyed by the dsn or connection dict
+_POOLS = {}
+# schemas of the database keyed by connection, they are listed once per connection
+_SCHEMAS_CACHE = weakref.WeakKeyDictionary()
+# key in _POOLS of the pool each pooled connection was opened by, set by _init_connection
+_POOL_KEYS = weakref.WeakKeyDictionary()
+
+
+def load_json(value=None):
+    """
+    Decode a json/jsonb value fetched from the database
+    :param value: str | dict | None, connections initialized by get_pool() decode json/jsonb into dicts, others return str
+    :return: the decoded value, None stays None
+    """
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+async def _init_connection(conn, pool_key=None):
+    """
+    Initialize a new pooled connection: json and jsonb values are decoded into python objects by asyncpg
+    :param conn: instance of asyncpg.Connection
+    :param pool_key: the key of the pool in _POOLS, used to share cached publish decisions between its connections
+    :return: None
+    """
+    _POOL_KEYS[conn] = pool_key
+    for type_name in ('json', 'jsonb'):
+        await conn.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+
+async def get_pool(dsn=None, min_size=None, max_size=None, **conn_dict):
+    """
+    Fetch the connection pool for the server/database defined by dsn or conn_dict.
+    The pool is created on the first call and reused by all subsequent calls with the
+    same connection info so the cost of connecting to the server is paid once.
+    :param dsn, str, Postgres DSN string
+    :param min_size: int, the number of connections opened when the pool is created, defaults to
+            utils.POOL_MINSIZE. Pass utils.POOL_MAXSIZE to open all of them upfront
+    :param max_size: int, the max number of connections in the pool, defaults to utils.POOL_MAXSIZE
+    :param conn_dict, dict with items representing info to connect to the server
+    :return: instance of asyncpg.Pool
+    NB the pools need to be closed with close_pools() before the event loop is closed. Explicit min_size/max_size
+    must match the sizes of an existing pool for the same connection info
+    """
+    assert dsn or conn_dict, f'Invalid dsn={dsn}'
+    key = dsn if dsn is not None else frozenset(conn_dict.items())
+    if key not in _POOLS:
+        # store the creation task so concurrent callers wait for the same pool
+        _POOLS[key] = asyncio.ensure_future(asyncpg.create_pool(
+            dsn=dsn,
+            min_size=utils.POOL_MINSIZE if min_size is None else min_size,
+            max_size=utils.POOL_MAXSIZE if max_size is None else max_size,
+            command_timeout=utils.POOL_COMMAND_TIMEOUT,
+            statement_cache_size=utils.STATEMENT_CACHE_SIZE,
+            max_cached_statement_lifetime=utils.STATEMENT_LIFETIME,
+            server_settings=utils.SERVER_SETTINGS,
+            init=functools.partial(_init_connection, pool_key=key),
+            **conn_dict
+        ))
+    try:
+        pool = await _POOLS[key]
+    except Exception:
+        _POOLS.pop(key, None)
+        raise
+    assert min_size is None or pool.get_min_size() == min_size, \
+        f'A pool with min_size={pool.get_min_size()} already exists, can not use min_size={min_size}'
+    assert max_size is None or pool.get_max_size() == max_size, \
+        f'A pool with max_size={pool.get_max_size()} already exists, can not use max_size={max_size}'
+    return pool
+
+
+async def get_pool_size(dsn=None, sql_file_name='show_max_connections.sql', **conn_dict):
+    """
+    Pick the size of a connection pool so that it takes at most half of the connections accepted by the server
+    :param dsn, str, Postgres DSN string
+    :param sql_file_name: str, the name of the SQL template
+    :param conn_dict, dict with items representing info to connect to the server
+    :return: int, min(utils.POOL_MAXSIZE, max_connections // 2) but at least 1
+    """
+    # single query connection, nothing to cache
+    conn = await asyncpg.connect(dsn=dsn, timeout=utils.CONNECTION_TIMEOUT, statement_cache_size=0, **conn_dict)
+    try:
+        server_max = await conn.fetchval(utils.get_sqlfile_content(sql_file_name=sql_file_name))
+    finally:
+        await conn.close()
+    return max(1, min(utils.POOL_MAXSIZE, int(server_max) // 2))
+
+
+async def close_pools():
+    """
+    Close all the connection pools created through get_pool()
+    :return: None
+    """
+    pools = list(_POOLS.values())
+    _POOLS.clear()
+    _SCHEMAS_CACHE.clear()
+    _COMMENT_CACHE.clear()
+    _PUBLISHABLE_CACHE.clear()
+    for pool_task in pools:
+        if not pool_task.done():
+            pool_task.cancel()
+            continue
+        # exception() raises CancelledError for a cancelled task
+        if pool_task.cancelled() or pool_task.exception() is not None:
+            continue
+        try:
+            await pool_task.result().close()
+        except Exception as e:
+            # keep closing the remaining pools
+            logger.error(f'Failed to close connection pool: {e}')
+
+
+def with_connection(func):
+    """
+    Decorator that makes the conn_obj argument of a coroutine function optional.
+    When conn_obj is not supplied a connection is acquired from the pool returned
+    by get_pool() for the dsn or conn_dict arguments, which are not passed on to func
+    :param func: coroutine function with a conn_obj parameter, supplied positionally or as keyword
+    :return: the wrapped coroutine function
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args, dsn=None, conn_dict=None, **kwargs):
+        bound = signature.bind_partial(*args, **kwargs)
+        if bound.arguments.get('conn_obj') is not None:
+            return await func(*args, **kwargs)
+        pool = await get_pool(dsn=dsn, **(conn_dict or {}))
+        async with pool.acquire(timeout=utils.CONNECTION_TIMEOUT) as conn:
+            bound.arguments['conn_obj'] = conn
+            return await func(*bound.args, **bound.kwargs)
+    return wrapper
+
+
+# raw table/column comments per connection, keyed by (table, column), column is None for table comments.
+# Comments do not change while a config is generated so each one is fetched once per connection
+_COMMENT_CACHE = weakref.WeakKeyDictionary()
+# publish decisions keyed by (pool key, table, column), column is None for tables.
+# Unlike the comments they are shared by all connections of a pool, the least recently used are dropped
+_PUBLISHABLE_CACHE = OrderedDict()
+PUBLISHABLE_CACHE_MAXSIZE = 4096
+_MISSING = object()
+
+
+@functools.lru_cache(maxsize=4096)
+def _split_qualified(table=None):
+    """
+    Split and validate a fully qualified table name
+    :param table: str, schema.table_name
+    :return: tuple, (schema, table_name)
+    """
+    schema, _, table_name = table.partition('.')
+    assert schema and table_name, f'table={table} is not fully qualified'
+    return schema, table_name
+
+
+def _extract_flag(raw=None, key=None):
+    """
+    Extract the value of one key from a raw (query string like) comment without parsing all of it
+    :param raw: str, the comment
+    :param key: str, the key to look for
+    :return: str, the unquoted value of the first occurrence of the key or None if the key is missing
+    """
+    # substring scan first, most comments do not hold the key at all
+    if not raw or f'{key}=' not in raw:
+        return None
+    for part in raw.split('&'):
+        k, _, v = part.partition('=')
+        if k == key:
+            return unquote_plus(v)
+    return None
+
+
+def _parse_comment(raw=None):
+    """
+    Parse a raw (query string like) comment into a dict, same as dict(parse_qsl(raw)).
+    Comments without escaped characters, ex. publish=true, are split directly
+    :param raw: str, the comment
+    :return: dict
+    """
+    if not raw:
+        return {}
+    if '%' in raw or '+' in raw:
+        return dict(parse_qsl(raw, strict_parsing=False))
+    parsed = {}
+    for part in raw.split('&'):
+        k, sep, v = part.partition('=')
+        # parse_qsl drops the items without a value
+        if sep and v:
+            parsed[k] = v
+    return parsed
+
+
+def publish_flag(raw_comment=None):
+    """
+    Interpret the publish keyword of a raw table/column comment
+    :param raw_comment: str, the comment as stored in the database
+    :return: None if the keyword publish does not exist in the comment
+             True | False, depending on the value set in the publish keyword
+    """
+    publish = _extract_flag(raw_comment, 'publish')
+    if not publish:
+        return
+    return publish.strip().lower() in TRUTHY_VALUES
+
+
+def clear_comment_cache(table=None):
+    """
+    Drop cached comments and the publish decisions derived from them
+    :param table: str, fully qualified table name. If supplied only the comments of this table are dropped
+    :return: None
+    """
+    if table is None:
+        _COMMENT_CACHE.clear()
+        _PUBLISHABLE_CACHE.clear()
+        return
+    for comments in list(_COMMENT_CACHE.values()):
+        for key in [k for k in comments if k[0] == table]:
+            del comments[key]
+    for key in [k for k in _PUBLISHABLE_CACHE if k[1] == table]:
+        del _PUBLISHABLE_CACHE[key]
+
+
+def _raw_connection(conn_obj=None):
+    """
+    Fetch the asyncpg.Connection behind conn_obj, used as key of the per connection caches.
+    Pool proxies are created on every acquire and can not be weak referenced, the wrapped connection lives
+    as long as the server session
+    :param conn_obj: asyncpg connection object or pool connection proxy
+    :return: instance of asyncpg.Connection
+    """
+    return getattr(conn_obj, '_con', None) or conn_obj
+
+
+def _connection_comments(conn_obj=None):
+    """
+    Fetch the comment cache of a connection
+    :param conn_obj: asyncpg connection object or pool connection proxy
+    :return: dict mapping (table, column) to the raw comment
+    """
+    return _COMMENT_CACHE.setdefault(_raw_connection(conn_obj), {})
+
+
+def _publishable_key(conn_obj=None, table=None, column=None):
+    """
+    Build the _PUBLISHABLE_CACHE key of a table/column for the pool conn_obj was acquired from
+    :param conn_obj: asyncpg connection object or pool connection proxy
+    :param table: str, fully qualified table name
+    :param column: str, column name, None for the table itself
+    :return: tuple | None, None if conn_obj does not come from a pool created by get_pool(). Such
+             connections are not cached
+    """
+    pool_key = _POOL_KEYS.get(_raw_connection(conn_obj))
+    if pool_key is None:
+        return
+    return pool_key, table, column
+
+
+def _get_publishable(key=None):
+    """
+    Fetch a cached publish decision
+    :param key: tuple, built by _publishable_key
+    :return: the cached decision or _MISSING
+    """
+    if key is None:
+        return _MISSING
+    value = _PUBLISHABLE_CACHE.get(key, _MISSING)
+    if value is not _MISSING:
+        _PUBLISHABLE_CACHE.move_to_end(key)
+    return value
+
+
+def _set_publishable(key=None, value=None):
+    """
+    Cache a publish decision, dropping the least recently used one once PUBLISHABLE_CACHE_MAXSIZE is exceeded
+    :param key: tuple, built by _publishable_key
+    :param value: None | True | False
+    :return: None
+    """
+    if key is None:
+        return
+    _PUBLISHABLE_CACHE[key] = value
+    _PUBLISHABLE_CACHE.move_to_end(key)
+    while len(_PUBLISHABLE_CACHE) > PUBLISHABLE_CACHE_MAXSIZE:
+        _PUBLISHABLE_CACHE.popitem(last=False)
 
 
-async def run_query(conn_obj=None, sql_query=None, method='execute'):
+async def execute_batched(conn_obj=None, sql_queries=None, batch_size=100):
     """
-    Run a SQL query represented by sql_query against the context represented by conn_obj
+    Execute a sequence of SQL statements by joining them into multi statement scripts.
+    Each script holds up to batch_size statements and takes one round trip to the server
+    instead of one round trip per statement
     :param conn_obj: asyncpg connection object
-    :param sql_query: str, SQL query
-    :param method: str, the asyncpg method used to perform the query. One of
-    'execute', 'fetch', 'fetch_val', 'fetch_all'
-    :return:
+    :param sql_queries: list of str, complete SQL statements terminated by ;
+    :param batch_size: int, the max number of statements sent in one script
+    :return: None
+    """
+    assert sql_queries, f'Invalid sql_queries={sql_queries}'
+    assert batch_size > 0, f'Invalid batch_size={batch_size}'
+    for i in range(0, len(sql_queries), batch_size):
+        await conn_obj.execute('\n'.join(sql_queries[i:i + batch_size]))
+
+
+@functools.lru_cache(maxsize=None)
+def _get_query_template(sql_file_name=None):
+    """
+    Read and validate a templated SQL script once, later calls are served from memory
+    :param sql_file_name: str, the name of the templated SQL script
+    :return: str, the SQL script
+    """
+    sql_query_txt = utils.get_sqlfile_content(sql_file_name=sql_file_name)
+
+    assert '{' in sql_query_txt, f'SQL query {sql_query_txt} does not contain python string template vars'
+    assert '}' in sql_query_txt, f'SQL query {sql_query_txt} does not contain python string template vars'
+    return sql_query_txt
+
+
+@functools.lru_cache(maxsize=1024)
+def _format_query(sql_file_name=None, items=()):
     """
-    assert conn_obj is not None, f'invalid conn_obj={conn_obj}'
-    assert sql_query not in ('', None), f'Invalid sql_query={sql_query}'
-    assert method not in ('', None), f'Invalid method={method}'
-    assert method in ALLOWED_METHODS, f'Invalid method={method}. Valid option are {",".join(ALLOWED_METHODS)}'
-    m = getattr(conn_obj, method)
-    return await m(sql_query)
+    Interpolate the items into a templated SQL script, the same template and items
+    are formatted once and served from memory afterwards
+    :param sql_file_name: str, the name of the templated SQL script
+    :param items: tuple of (name, value) pairs sorted by name, the values need to be hashable
+    :return: interpolated SQL script
+    """
+    return _get_query_template(sql_file_name=sql_file_name).format(**dict(items))
 
 
 def interpolate_query(sql_file_name=None, **kwargs):
@@ -40,12 +353,9 @@ def interpolate_query(sql_file_name=None, **kwargs):
     :param kwargs: dict containing items ot be interpolated
     :return: interpolated SQL script
     """
-    sql_query_txt = utils.get_sqlfile_content(sql_file_name=sql_file_name)
-
-    assert '{' in sql_query_txt, f'SQL query {sql_query_txt} does not contain python string template vars'
-    assert '}' in sql_query_txt, f'SQL query {sql_query_txt} does not contain python string template vars'
+    sql_query_txt = _get_query_template(sql_file_name=sql_file_name)
     try:
-        return sql_query_txt.format(**kwargs)
+        return _format_query(sql_file_name=sql_file_name, items=tuple(sorted(kwargs.items())))
     except KeyError as ke:
         logger.error(f'SQL query template {sql_query_txt} \nneeds {ke} argument')
         raise
@@ -54,7 +364,8 @@ def interpolate_query(sql_file_name=None, **kwargs):
         raise
 
 
-async def list_function_sources(conn_obj=None, sql_file_name='func_sources.sql', schema=None):
+@with_connection
+async def list_function_sources(conn_obj=None, sql_file_name='func_sources.sql', schema=None, user=None):
     """
     List functions that can be used by martin
     see https://github.com/maplibre/martin#function-sources
@@ -62,19 +373,18 @@ async def list_function_sources(conn_obj=None, sql_file_name='func_sources.sql',
     In short all function that have exactly 4 params (z,x,y,query_params) are returned
     :param conn_obj: instance of asyncpg.connection
     :param: sql_file_name, str, the name of the SQL file that holds te query
+    :param user: str, optional, if supplied the executable field of every record tells if the user
+            has been granted execute privilege on the function, otherwise it is None
     :return: list of asyncpg.Records for each found function
     """
 
     assert schema is not None, f'Invalid schema={schema}'
 
-    sql_query = interpolate_query(sql_file_name=sql_file_name, schema=schema)
-    return await run_query(
-        conn_obj=conn_obj,
-        sql_query=sql_query,
-        method='fetch'
-    )
+    sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
+    return await conn_obj.fetch(sql_query, schema, user)
 
 
+@with_connection
 async def table_exists(conn_obj=None, sql_file_name='table_exists.sql', table=None):
     """
     Check if a given table exists
@@ -85,48 +395,63 @@ async def table_exists(conn_obj=None, sql_file_name='table_exists.sql', table=No
     """
     assert table not in ('', None), f'Invalid table_name={table}'
     assert '.' in table, f'table={table} is not fully qualified'
-    sql_query = interpolate_query(sql_file_name=sql_file_name, table=table)
-    try:
-        await run_query(
-            conn_obj=conn_obj,
-            sql_query=sql_query,
-            method='execute'
-        )
-        return True
-
-    except asyncpg.exceptions.UndefinedTableError:
-        return False
+    sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
+    return await conn_obj.fetchval(sql_query, table)
 
 
-async def get_column_comment(conn_obj=None, sql_file_name='get_col_comment.sql', table=None, column=None):
+@with_connection
+async def get_column_comment(conn_obj=None, sql_file_name='get_col_comment.sql', table=None, column=None, raw=False):
     """
     Get comment for a column of a table
     :param table: str, fully qualified (schema.table_name) table name
     :param column: str, column name
     :param conn_obj: instance of asyncpg connection object
     :param sql_file_name, str, the name of SQL file to use to run the query
-    :return: None
+    :param raw: bool, if True the comment is returned as it is stored in the database (None if missing)
+    :return: dict, the urldecoded comment
     """
     assert table not in ('', None), f'Invalid table_name={table}'
-    assert '.' in table, f'table={table} is not fully qualified'
+    schema, table_name = _split_qualified(table)
     assert column not in ('', None), f'Invalid column={column}'
 
-    schema, table_name = table.split('.')
-    sql_query = interpolate_query(
-        sql_file_name=sql_file_name,
-        schema=schema,
-        table_name=table_name,
-        column=column,
+    comments = _connection_comments(conn_obj)
+    cache_key = table, column
+    if cache_key not in comments:
+        sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
+        result = await conn_obj.fetchval(sql_query, schema, table_name, column)
+        comments[cache_key] = result
+    if raw:
+        return comments[cache_key]
+    return _parse_comment(comments[cache_key])
 
-    )
-    result = await run_query(
-        conn_obj=conn_obj,
-        sql_query=sql_query,
-        method='fetchval'
-    )
-    return dict(urlparse.parse_qsl(result, strict_parsing=False))
 
+@with_connection
+async def get_column_comments(conn_obj=None, sql_file_name='get_col_comments.sql', table=None, raw=False):
+    """
+    Get the comments of all columns of a table in one query
+    :param conn_obj: instance of asyncpg connection object
+    :param sql_file_name, str, the name of SQL file to use to run the query
+    :param table: str, fully qualified (schema.table_name) table name
+    :param raw: bool, if True the comments are returned as they are stored in the database (None if missing)
+    :return: dict mapping every column name to the dict parsed from its comment (empty if it has no comment)
+    NB the comments are also stored in the cache used by get_column_comment
+    """
+    assert table not in ('', None), f'Invalid table_name={table}'
+    schema, table_name = _split_qualified(table)
 
+    sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
+    res = await conn_obj.fetch(sql_query, schema, table_name)
+    cached = _connection_comments(conn_obj)
+    comments = {}
+    for r in res:
+        comments[r['column_name']] = r['description']
+        cached[table, r['column_name']] = r['description']
+    if raw:
+        return comments
+    return {k: _parse_comment(v) for k, v in comments.items()}
+
+
+@with_connection
 async def set_column_comment(conn_obj=None,
                              sql_file_name='set_col_comment.sql',
                              table=None,
@@ -141,6 +466,7 @@ async def set_column_comment(conn_obj=None,
     :param conn_obj: instance of asyncpg connection object
     :param sql_file_name, str, the name of SQL file to use to run the query
     :return: None
+    NB nothing is written if the column is already commented with the same value
     """
     assert table not in ('', None), f'Invalid table={table}'
     assert '.' in table, f'table={table} is not fully qualified'
@@ -154,19 +480,25 @@ async def set_column_comment(conn_obj=None,
         raise
 
     url_encoded_value = urlencode(value)
+    # idempotent reconfigures write the same comments again, skip the catalog write.
+    # The current comment is read from the database, the cache can be stale if another session changed it
+    schema, table_name = _split_qualified(table)
+    sql_query = utils.get_sqlfile_content(sql_file_name='get_col_comment.sql')
+    current = await conn_obj.fetchval(sql_query, schema, table_name, column)
+    if current == url_encoded_value:
+        logger.debug(f'Column {column} from {table} is already commented with {url_encoded_value}')
+        return
     sql_query = interpolate_query(
         sql_file_name=sql_file_name,
         table=table,
         column=column,
         url_encoded_value=url_encoded_value
     )
-    await run_query(
-        conn_obj=conn_obj,
-        sql_query=sql_query,
-        method='execute'
-    )
+    await conn_obj.execute(sql_query)
+    clear_comment_cache(table=table)
 
 
+@with_connection
 async def delete_column_comment(conn_obj=None, sql_file_name='delete_col_comment.sql', table=None, column=None):
     """
     Delete comment for a column of a table
@@ -184,13 +516,11 @@ async def delete_column_comment(conn_obj=None, sql_file_name='delete_col_comment
         table=table,
         column=column,
     )
-    await run_query(
-        conn_obj=conn_obj,
-        sql_query=sql_query,
-        method='execute'
-    )
+    await conn_obj.execute(sql_query)
+    clear_comment_cache(table=table)
 
 
+@with_connection
 async def set_table_comment(conn_obj=None,
                             sql_file_name='set_table_comment.sql',
                             table=None,
@@ -218,19 +548,22 @@ async def set_table_comment(conn_obj=None,
         logger.error(f'Table comment value={value} needs to be a mapping. The supplied value is {type(value)}')
         raise
     url_encoded_value = urlencode(value)
+    sql_query = utils.get_sqlfile_content(sql_file_name='get_table_comment.sql')
+    current = await conn_obj.fetchval(sql_query, table)
+    if current == url_encoded_value:
+        logger.debug(f'Table {table} is already commented with {url_encoded_value}')
+        return
     sql_query = interpolate_query(
         sql_file_name=sql_file_name,
         table=table,
         url_encoded_value=url_encoded_value
     )
-    await run_query(
-        conn_obj=conn_obj,
-        sql_query=sql_query,
-        method='execute'
-    )
+    await conn_obj.execute(sql_query)
+    clear_comment_cache(table=table)
 
 
-async def get_table_comment(conn_obj=None, sql_file_name='get_table_comment.sql', table=None):
+@with_connection
+async def get_table_comment(conn_obj=None, sql_file_name='get_table_comment.sql', table=None, raw=False):
     """
         Fetch the comment for a table.
         The comment value is a dict and before being returned it is urldecoded.
@@ -240,6 +573,7 @@ async def get_table_comment(conn_obj=None, sql_file_name='get_table_comment.sql'
         :param conn_obj: instance of asyncpg.connection
         :param sql_file_name: str, the name of the SQL template
         :param table:str, the fully qualified name of the table
+        :param raw: bool, if True the comment is returned as it is stored in the database (None if missing)
 
         :return: dict representing the urldecoded query string extracted from the comment
         NB. the comments are meant to be used as control/decision structures.
@@ -247,18 +581,19 @@ async def get_table_comment(conn_obj=None, sql_file_name='get_table_comment.sql'
     """
     assert table not in ('', None), f'Invalid table={table}'
     assert '.' in table, f'table={table} is not fully qualified'
-    sql_query = interpolate_query(
-        sql_file_name=sql_file_name,
-        table=table,
-    )
-    result = await run_query(
-        conn_obj=conn_obj,
-        sql_query=sql_query,
-        method='fetchval'
-    )
-    return dict(urlparse.parse_qsl(result, strict_parsing=False))
+    comments = _connection_comments(conn_obj)
+    cache_key = table, None
+    if cache_key not in comments:
+        sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
+        result = await conn_obj.fetchval(sql_query, table)
+        # to_regclass yields NULL for missing tables, same as for tables without a comment
+        comments[cache_key] = result
+    if raw:
+        return comments[cache_key]
+    return _parse_comment(comments[cache_key])
 
 
+@with_connection
 async def delete_table_comment(conn_obj=None, sql_file_name='delete_table_comment.sql', table=None):
     """
         Delete  the comment for a table.
@@ -278,15 +613,61 @@ async def delete_table_comment(conn_obj=None, sql_file_name='delete_table_commen
         sql_file_name=sql_file_name,
         table=table,
     )
-    result = await run_query(
-        conn_obj=conn_obj,
-        sql_query=sql_query,
-        method='execute'
-    )
-    assert result == 'COMMENT'
+    await conn_obj.execute(sql_query)
+    clear_comment_cache(table=table)
 
 
-async def column_is_publishable(conn_obj=None, table=None, column=None):
+@with_connection
+async def set_table_and_column_comments(conn_obj=None, table=None, table_value=None, column_values=None):
+    """
+    Set the comment for a table and any number of its columns in one round trip.
+    The COMMENT statements are interpolated from the same templates used by set_table_comment and
+    set_column_comment and sent as one multi statement script inside a transaction.
+
+    :param conn_obj: instance of asyncpg.connection
+    :param table: str, the fully qualified name of the table
+    :param table_value: dict, the table comment, optional
+    :param column_values: dict, maps column names to the dict used as the comment of that column, optional
+    :return: None
+    """
+    assert table not in ('', None), f'Invalid table={table}'
+    assert '.' in table, f'table={table} is not fully qualified'
+    assert table_value or column_values, f'Invalid table_value={table_value} and column_values={column_values}'
+
+    sql_queries = []
+    if table_value:
+        try:
+            table_value.items()
+        except (TypeError, AttributeError) as e:
+            logger.error(f'Table comment value={table_value} needs to be a mapping. The supplied value is {type(table_value)}')
+            raise
+        sql_queries.append(interpolate_query(
+            sql_file_name='set_table_comment.sql',
+            table=table,
+            url_encoded_value=urlencode(table_value)
+        ))
+    for column, value in (column_values or {}).items():
+        assert column not in ('', None), f'Invalid column={column}'
+        assert value, f'Invalid column comment value {value}'
+        try:
+            value.items()
+        except (TypeError, AttributeError) as e:
+            logger.error(f'Column comment value={value} needs to be a mapping. The suplied value is {type(value)}')
+            raise
+        sql_queries.append(interpolate_query(
+            sql_file_name='set_col_comment.sql',
+            table=table,
+            column=column,
+            url_encoded_value=urlencode(value)
+        ))
+
+    async with conn_obj.transaction():
+        await execute_batched(conn_obj=conn_obj, sql_queries=sql_queries)
+        clear_comment_cache(table=table)
+
+
+@with_connection
+async def column_is_publishable(conn_obj=None, table=None, column=None, col_comments=None):
     """
     Check if a column is publishable by extracting the column comment and
     treating  it as a query string and interpreting its meaning.
@@ -296,6 +677,8 @@ async def column_is_publishable(conn_obj=None, table=None, column=None):
     :param conn_obj: instance of asyncpg.connection
     :param table: str, the name of the table
     :param column: str, the name of the column
+    :param col_comments: dict, optional, the raw comments of all columns of the table as returned by
+            get_column_comments(raw=True). When supplied no query is issued
     :return: None if the keyword publish does not exist in the column comment
              True | False, depending on the value set in the publish keyword
 
@@ -303,14 +686,24 @@ async def column_is_publishable(conn_obj=None, table=None, column=None):
     assert table not in ('', None), f'Invalid table_name={table}'
     assert '.' in table, f'table={table} is not fully qualified'
     assert column not in ('', None), f'Invalid column={column}'
-    col_comment_dict = await get_column_comment(conn_obj=conn_obj,
-                                                table=table,
-                                                column=column)
-    if not 'publish' in col_comment_dict:
-        return
-    return eval(col_comment_dict['publish'].lower().capitalize())
-
-
+    if col_comments is not None:
+        raw_comment = col_comments.get(column)
+    else:
+        cache_key = _publishable_key(conn_obj=conn_obj, table=table, column=column)
+        cached = _get_publishable(cache_key)
+        if cached is not _MISSING:
+            return cached
+        raw_comment = await get_column_comment(conn_obj=conn_obj,
+                                               table=table,
+                                               column=column,
+                                               raw=True)
+    is_publishable = publish_flag(raw_comment)
+    if col_comments is None:
+        _set_publishable(key=cache_key, value=is_publishable)
+    return is_publishable
+
+
+@with_connection
 async def column_is_accessible(conn_obj=None, sql_file_name='column_is_accessible.sql', table=None, user=None, column=None):
     """
     Check if a column is publishable by extracting the column comment and
@@ -323,6 +716,7 @@ async def column_is_accessible(conn_obj=None, sql_file_name='column_is_accessibl
     :param column: str, the name of the column
     :return: None if the keyword publish does not exist in the column comment
              True | False, depending on the value set in the publish keyword
+    NB deprecated, get_table_cfg fetches the column privileges together with the table info
 
     """
     assert table not in ('', None), f'Invalid table_name={table}'
@@ -330,18 +724,34 @@ async def column_is_accessible(conn_obj=None, sql_file_name='column_is_accessibl
     assert user not in ('', None), f'Invalid user={column}'
     assert column not in ('', None), f'Invalid column={column}'
 
-    sql_query = interpolate_query(
-        sql_file_name=sql_file_name,
-        user=user,
-        table=table,
-        column=column
-    )
+    sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
+    return await conn_obj.fetchval(sql_query, user, table, column)
 
-    return await run_query(
-        conn_obj=conn_obj,
-        sql_query=sql_query,
-        method='fetchval'
-    )
+
+@with_connection
+async def columns_are_accessible(conn_obj=None, sql_file_name='columns_are_accessible.sql', table=None, user=None, columns=None):
+    """
+    Check in one query if a user has been granted SELECT privilege on several columns of a table
+
+    :param conn_obj: instance of asyncpg.connection
+    :param sql_file_name: str, the name of the SQL template
+    :param table: str, the fully qualified name of the table
+    :param user: str, the name of the user
+    :param columns: iter of str, the names of the columns
+    :return: dict mapping every column name to True | False
+
+    """
+    assert table not in ('', None), f'Invalid table_name={table}'
+    assert '.' in table, f'table={table} is not fully qualified'
+    assert user not in ('', None), f'Invalid user={user}'
+    assert columns is not None, f'Invalid columns={columns}'
+
+    sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
+    res = await conn_obj.fetch(sql_query, user, table, list(columns))
+    return {r['column_name']: r['select'] for r in res}
+
+
+@with_connection
 async def function_is_publishable(conn_obj=None, sql_file_name='function_is_accessible.sql',
                                   user=None, function_name=None, schema=None):
 
@@ -349,22 +759,12 @@ async def function_is_publishable(conn_obj=None, sql_file_name='function_is_acce
     assert function_name not in ('', None), f'Invalid function_name={function_name}'
     assert schema not in ('', None), f'Invalid schema={schema}'
 
-    sql_query = interpolate_query(
-        sql_file_name=sql_file_name,
-        function_name=function_name,
-        schema=schema,
-        user=user,
-
-    )
-
-    return await run_query(
-        conn_obj=conn_obj,
-        sql_query=sql_query,
-        method='fetchval'
-    )
+    sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
+    return await conn_obj.fetchval(sql_query, user, function_name, schema)
 
 
 
+@with_connection
 async def schema_is_accessible(conn_obj=None, sql_file_name='schema_is_accessible.sql', schema=None,  user=None ):
     """
         Checks is a user has usage privilege on a given schema
@@ -378,20 +778,11 @@ async def schema_is_accessible(conn_obj=None, sql_file_name='schema_is_accessibl
     assert schema not in ['', None], f'Invalid schema {schema}'
     assert user not in ['', None], f'Invalid user {schema}'
 
-    sql_query = interpolate_query(
-        sql_file_name=sql_file_name,
-        schema=schema,
-        user=user,
-
-    )
-
-    return await run_query(
-        conn_obj=conn_obj,
-        sql_query=sql_query,
-        method='fetchval'
-    )
+    sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
+    return await conn_obj.fetchval(sql_query, user, schema)
 
 
+@with_connection
 async def table_is_accessible(conn_obj=None, sql_file_name='table_is_accessible.sql', user=None, table=None, ):
     """
     Check if a table is publishable by checking if the given user has
@@ -401,24 +792,17 @@ async def table_is_accessible(conn_obj=None, sql_file_name='table_is_accessible.
     :param user: str, the name of the user
     :param table: str, the name of the table
     :return: True if the user has been granted select rights, False otherwise
+    NB deprecated, get_table_cfg fetches the table privilege together with the table info
 
     """
     assert table not in ('', None), f'Invalid table_name={table}'
     assert '.' in table, f'table={table} is not fully qualified'
-    sql_query = interpolate_query(
-        sql_file_name=sql_file_name,
-        user=user,
-        table=table,
-    )
-
-    return await run_query(
-        conn_obj=conn_obj,
-        sql_query=sql_query,
-        method='fetchval'
-    )
+    sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
+    return await conn_obj.fetchval(sql_query, user, table)
 
 
 
+@with_connection
 async def table_is_publishable(conn_obj=None, table=None, ):
     """
     Check if a table is publishable by extracting the table comment and
@@ -435,14 +819,19 @@ async def table_is_publishable(conn_obj=None, table=None, ):
     assert table not in ('', None), f'Invalid table_name={table}'
     assert '.' in table, f'table={table} is not fully qualified'
 
-    table_comment_dict = await get_table_comment(conn_obj=conn_obj,
-                                                 table=table,
-                                                 )
-    if not 'publish' in table_comment_dict:
-        return False
-    return eval(table_comment_dict['publish'].lower().capitalize())
+    cache_key = _publishable_key(conn_obj=conn_obj, table=table)
+    is_publishable = _get_publishable(cache_key)
+    if is_publishable is _MISSING:
+        raw_comment = await get_table_comment(conn_obj=conn_obj,
+                                              table=table,
+                                              raw=True
+                                              )
+        is_publishable = publish_flag(raw_comment) or False
+        _set_publishable(key=cache_key, value=is_publishable)
+    return is_publishable
 
 
+@with_connection
 async def drop_table(conn_obj=None, sql_file_name='drop_table.sql', table=None):
     """
     Removes a given table from the database encapsulated into the conn_obj
@@ -457,26 +846,17 @@ async def drop_table(conn_obj=None, sql_file_name='drop_table.sql', table=None):
         sql_file_name=sql_file_name,
         table=table,
     )
-    await run_query(
-        conn_obj=conn_obj,
-        sql_query=sql_query,
-        method='execute'
-    )
+    await conn_obj.execute(sql_query)
+    clear_comment_cache(table=table)
 
+@with_connection
 async def get_table_primary_key(conn_obj=None, sql_file_name='get_table_primary_key.sql', table=None):
     assert table not in ('', None), f'Invalid table_name={table}'
-    assert '.' in table, f'table={table} is not fully qualified'
-    schema, table_name = table.split('.')
-    sql_query = interpolate_query(
-        sql_file_name=sql_file_name,
-        table_name=table_name
-    )
-    return await run_query(
-        conn_obj=conn_obj,
-        sql_query=sql_query,
-        method='fetch'
-    )
+    schema, table_name = _split_qualified(table)
+    sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
+    return await conn_obj.fetch(sql_query, schema, table_name)
 
+@with_connection
 async def get_table_columns(conn_obj=None, sql_file_name='get_table_columns.sql', table=None):
     """
     Fetch fundamental  info about a given table:
@@ -500,18 +880,9 @@ async def get_table_columns(conn_obj=None, sql_file_name='get_table_columns.sql'
     :return: list with one asyncpg record
     """
     assert table not in ('', None), f'Invalid table_name={table}'
-    assert '.' in table, f'table={table} is not fully qualified'
-    schema, table_name = table.split('.')
-    sql_query = interpolate_query(
-        sql_file_name=sql_file_name,
-        schema=schema,
-        table_name=table_name,
-    )
-    return await run_query(
-        conn_obj=conn_obj,
-        sql_query=sql_query,
-        method='fetch'
-    )
+    schema, table_name = _split_qualified(table)
+    sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
+    return await conn_obj.fetch(sql_query, schema, table_name)
 
 
 
@@ -522,20 +893,17 @@ async def database_exists(dsn=None, **conn_dict):
     :param dsn, str, Postgres DSN string
     :param conn_dict, dict with items representing info to connect to the server
     :return: True if the given database exists, False otherwise
+    NB the check uses one short-lived connection so it does not create a pool with the default sizes
+    for the dsn that a later get_pool() call with explicit sizes would collide with
     """
+    if dsn is not None:
+        assert dsn, f'Invalid dsn={dsn}'
     try:
-        if dsn is not None:
-            assert dsn, f'Invalid dsn={dsn}'
-            conn_dict = utils.cs2d(dsn)
-        conn = await asyncpg.connect(
-            command_timeout=utils.POOL_COMMAND_TIMEOUT, timeout=utils.CONNECTION_TIMEOUT,
-            **conn_dict)
-
-        await conn.close()
-
-        return True
+        conn = await asyncpg.connect(dsn=dsn, timeout=utils.CONNECTION_TIMEOUT, statement_cache_size=0, **conn_dict)
     except asyncpg.InvalidCatalogNameError:
         return False
+    await conn.close()
+    return True
 
 
 async def list_databases(dsn=None, sql_file_name='list_databases.sql', **conn_dict):
@@ -546,75 +914,92 @@ async def list_databases(dsn=None, sql_file_name='list_databases.sql', **conn_di
     :param conn_dict, dict with items representing info to connect to the server
 
     :return: a tuple with the names of the databases that exists in the postgres server
+    NB the query runs on the shared template1 pool from get_pool(), close it with close_pools()
     """
     if dsn is not None:
         assert dsn, f'Invalid dsn={dsn}'
         conn_dict = utils.cs2d(dsn)
-    conn_dict['database'] = 'template1'
-
-    conn = await asyncpg.connect(
-        command_timeout=utils.POOL_COMMAND_TIMEOUT,
-        timeout=utils.CONNECTION_TIMEOUT,
-        **conn_dict
-    )
+    conn_dict = dict(conn_dict, database='template1')
 
+    # a single query runs on template1, do not open POOL_MINSIZE connections for it
+    pool = await get_pool(min_size=1, **conn_dict)
     sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
-    res = await run_query(
-        conn_obj=conn,
-        sql_query=sql_query,
-        method='fetch'
-    )
-    await conn.close()
-    return tuple([e['datname'] for e in res])
+    async with pool.acquire(timeout=utils.CONNECTION_TIMEOUT) as conn:
+        res = await conn.fetch(sql_query)
+    return tuple(e['datname'] for e in res)
 
 
+@with_connection
 async def list_schemas(conn_obj=None, sql_file_name='list_schemas.sql'):
     """
     List all available schemas using either the conn-obj or conn_string
     :param conn_obj, instance of asyncpg.connection
     :param sql_file_name, str, the name of the SQL template
     :return: a tuple with the available schemas
-    NB the information_schema and pg_catalog are excluded
+    NB the information_schema, pg_catalog, pg_toast and temporary schemas are excluded by the query.
+    The schemas are fetched once per connection
     """
-
-    sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
-    res = await run_query(
-        conn_obj=conn_obj,
-        sql_query=sql_query,
-        method='fetch'
-    )
-
-    return tuple(set([e['schema_name'] for e in res]) - set(['information_schema', 'pg_catalog']))
+    con = _raw_connection(conn_obj)
+    if con not in _SCHEMAS_CACHE:
+        sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
+        res = await conn_obj.fetch(sql_query)
+        _SCHEMAS_CACHE[con] = tuple(e['schema_name'] for e in res)
+    return _SCHEMAS_CACHE[con]
 
 
-async def list_tables(conn_obj=None, schema=None):
+@with_connection
+async def list_tables(conn_obj=None, schema=None, with_comments=False, validate=False):
     """
     Lists the tables in the database &| schema
     :param conn_obj: instance of asyncpg.connection
     :param schema: str, the name of the schema where the tables will be listed
-    :return: set of the fully qualified names of the found tables
+    :param with_comments: bool, if True the raw comments of the tables, fetched by the same query, are returned as well
+    :param validate: bool, if True check first that the schema exists
+    :return: set of the fully qualified names of the found tables or, if with_comments is True,
+            a dict mapping the fully qualified names to the raw table comments
     """
     if schema is not None:
         assert schema != '', f'Invalid schema={schema}'
-        available_schemas = await list_schemas(conn_obj=conn_obj)
-        assert schema in available_schemas, f'schema "{schema}" does not exist in {conn_obj} '
+        if validate:
+            available_schemas = await list_schemas(conn_obj=conn_obj)
+            assert schema in available_schemas, f'schema "{schema}" does not exist in {conn_obj} '
         sql_file_name = 'list_schema_tables.sql'
-        sql_query = interpolate_query(
-            sql_file_name=sql_file_name,
-            schema=schema,
+        args = schema,
+    else:
+        sql_file_name = 'list_tables.sql'
+        args = ()
+    sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
+    res = await conn_obj.fetch(sql_query, *args)
+    if with_comments:
+        return {f'{e["schemaname"]}.{e["tablename"]}': e['comment'] for e in res}
+    if schema is not None:
+        return {f'{schema}.{e["tablename"]}' for e in res}
+    return {f'{e["schemaname"]}.{e["tablename"]}' for e in res}
 
-        )
+
+async def iter_tables(conn_obj=None, schema=None):
+    """
+    Iterate over the tables in the database &| schema as they are fetched from a server side cursor
+    :param conn_obj: instance of asyncpg.connection
+    :param schema: str, the name of the schema where the tables will be listed
+    :return: async generator of (fully qualified table name, raw table comment) tuples
+    NB the cursor runs inside a transaction, conn_obj can not be used for other queries until the iteration ends
+    """
+    assert conn_obj is not None, f'Invalid conn_obj={conn_obj}'
+    if schema is not None:
+        assert schema != '', f'Invalid schema={schema}'
+        sql_file_name = 'list_schema_tables.sql'
+        args = schema,
     else:
         sql_file_name = 'list_tables.sql'
-        sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
-    res = await run_query(
-        conn_obj=conn_obj,
-        sql_query=sql_query,
-        method='fetch'
-    )
-    return set([f'{e["schemaname"]}.{e["tablename"]}' for e in res])
+        args = ()
+    sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
+    async with conn_obj.transaction():
+        async for e in conn_obj.cursor(sql_query, *args):
+            yield f'{e["schemaname"]}.{e["tablename"]}', e['comment']
 
 
+@with_connection
 async def get_bbox(conn_obj=None, table=None, geom_column=None, srid=None, compute_extent=False):
 
     """
@@ -631,116 +1016,135 @@ async def get_bbox(conn_obj=None, table=None, geom_column=None, srid=None, compu
     """
     assert srid is not None, f'Invalid srid={srid}'
     assert table not in ('', None), f'Invalid table={table}'
-    assert '.' in table, f'table={table} is not fully qualified'
+    schema, table_name = _split_qualified(table)
     assert geom_column not in ('', None), f'Invalid geom_column={geom_column}'
 
-    schema, table_name = table.split('.')
     if not compute_extent:
         logger.debug(f'using estimated extent')
-        sql_file_name = 'get_estimated_bbox.sql'
+        sql_query = utils.get_sqlfile_content(sql_file_name='get_estimated_bbox.sql')
+        res = await conn_obj.fetchrow(sql_query, schema, table_name, geom_column, srid)
     else:
-        sql_file_name = 'get_computed_bbox.sql'
-    sql_query = interpolate_query(
-        sql_file_name=sql_file_name,
-        schema=schema,
-        table_name=table_name,
-        geom_column=geom_column,
-        srid=srid
-    )
-    res = await run_query(
-        conn_obj=conn_obj,
-        sql_query=sql_query,
-        method='fetch'
-    )
-    assert len(res) == 1, f'Failed to compute spatial extent for table {table}'
-    res = res[0]
-    return res['xmin'], res['ymin'], res['xmax'], res['ymax']
+        # the table and column are identifiers and can not be passed as query arguments
+        sql_query = interpolate_query(
+            sql_file_name='get_computed_bbox.sql',
+            schema=schema,
+            table_name=table_name,
+            geom_column=geom_column,
+            srid=srid
+        )
+        # the query text differs for every table, run it as a one-off statement that does
+        # not evict the parameterized templates from the statement cache
+        stmt = await conn_obj.prepare(sql_query)
+        res = await stmt.fetchrow()
+    assert res is not None, f'Failed to compute spatial extent for table {table}'
+    # both queries select exactly xmin, ymin, xmax, ymax in this order
+    return tuple(res)
 
 
-async def get_table_cfg(conn_obj=None, user=None, table=None):
+@with_connection
+async def introspect_schema(conn_obj=None, sql_file_name='schema_introspect.sql', schema=None, user=None):
     """
-    Create a config dictionary suitable for configuring martin vector tile service
-     for a given table located  in  a database defined by conn_obj or conn_dict
-    :param: conn_obj, instance of asyncpg.connection
-    :param table: str, fully qualified table name
-    :return: dict with the configuration as per https://github.com/urbica/martin#configuration-file
-    NB: martin support tables/layers with more than one geometry column. This is desirable because
-    the web mercator projection EPSG 3857 should be used for displaying and is not suitable for
-    performing certain spatial computations
+    Fetch in one query everything needed to configure the tables with a geometry column located in a schema:
+    geometry column, SRID, geometry type, attribute columns and their comments, table comment, primary key
+    and estimated extent. If user is supplied the table and column privileges of the user are fetched as well
+    :param conn_obj: instance of asyncpg.connection
+    :param sql_file_name: str, the name of the SQL template
+    :param schema: str, the name of the schema
+    :param user: str, optional, the user for which the privileges are checked
+    :return: list of asyncpg records, one per table, see build_table_cfg
     """
-    assert '.' in table, f'Invalid table={table}. Needs to be fully qualified: schema.table_name'
-    schema, table_name = table.split('.')
+    assert schema not in ('', None), f'Invalid schema={schema}'
+    sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
+    return await conn_obj.fetch(sql_query, schema, user)
 
-    logger.info(f'Creating configuration for {table}')
 
-    columns = await get_table_columns(conn_obj=conn_obj, table=table)
-    if not columns:
-        logger.info(
-            f'Skipping table {table}. No columns detected')
-        return
-    srid = None
-    for r in columns:  # prefer/pick the 3857 geom or the last in case 3857 is not used and more than 1
-        srid = r['srid']
-        geom_column = r['geom_column']
-        geom_type = r['type']
-        properties = r['properties']
-        if srid == 3857:
-            break
+def build_table_cfg(table=None, record=None, col_privileges=None):
+    """
+    Assemble the config of a table from the record returned by introspect_schema or the get_table_info.sql query.
+    No queries are issued
+    :param table: str, fully qualified table name
+    :param record: asyncpg record or dict with the geom_column, srid, type, properties, comments,
+            pkey_column, pkey_type, xmin, ymin, xmax and ymax items
+    :param col_privileges: dict, optional, maps the column names to the SELECT privilege of a user. If supplied
+            it decides which columns are published instead of the publish keyword in the column comments
+    :return: dict with the configuration of the table as per https://github.com/urbica/martin#configuration-file,
+            the caller files it under the table name
+    """
+    schema, table_name = _split_qualified(table)
     tbl_dict = dict(id=table, schema=schema, table=table_name)
 
-    try:
-        bb = await get_bbox(
-            conn_obj=conn_obj,
-            table=table,
-            geom_column=geom_column,
-            srid=srid,
-            compute_extent=False
-        )
-    except Exception as e:
-        logger.error(
-            f'Failed to fetch bounding box for {table} because {e}. Skipping...')
-        return
-
-    try:
-        prim_key_rec = await get_table_primary_key(conn_obj=conn_obj,table=table)
-    except Exception as e:
-        logger.info(f'Features in table {table} will not have feature id .')
-        prim_key_rec = []
-
-    tbl_dict['bounds'] = list(bb)
-    tbl_dict['srid'] = srid
-    tbl_dict['geometry_column'] = geom_column
-    if prim_key_rec:
-        pkey_rec = prim_key_rec[0]
-        pkey_name = pkey_rec['column_name']
-        pkey_type = pkey_rec['data_type']
-        if not 'int' in pkey_type:
+    tbl_dict['bounds'] = [record['xmin'], record['ymin'], record['xmax'], record['ymax']]
+    tbl_dict['srid'] = record['srid']
+    tbl_dict['geometry_column'] = record['geom_column']
+    if record['pkey_column'] is not None:
+        if not 'int' in record['pkey_type']:
             logger.warning(f'table {table} has a non number primary key')
-        tbl_dict['id_column'] = pkey_name
+        tbl_dict['id_column'] = record['pkey_column']
     else:
-        tbl_dict['id_column'] = '~'
+        logger.info(f'Features in table {table} will not have feature id .')
+        tbl_dict['id_column'] = None
 
     tbl_dict['extent'] = 4096
     tbl_dict['buffer'] = 64
-    tbl_dict['geometry_type'] = geom_type
+    tbl_dict['geometry_type'] = record['type']
     tbl_dict['clip_geometry'] = True
-    properties = json.loads(properties)
+    properties = load_json(record['properties'])
+    col_comments = load_json(record['comments'])
     props = {}
     # properties/attributes are  eagerly collected and are skipped only
     # is the column is marked with publish=False
     for k, v in properties.items():
-
-        if not user:
-            col_is_publishable = await column_is_publishable(conn_obj=conn_obj, table=table, column=k)
+        if col_privileges is not None:
+            col_is_publishable = col_privileges.get(k)
         else:
-            col_is_publishable = await column_is_accessible(conn_obj=conn_obj,table=table,user=user,column=k)
+            col_is_publishable = publish_flag(col_comments.get(k))
         if col_is_publishable is False:
             logger.debug(
                 f'Column {k} from {table} is not publishable and will not be included in the config')
             continue
         props[k] = v
 
-    tbl_dict['properties:'] = props
+    tbl_dict['properties'] = props
+
+    return tbl_dict
+
+
+@with_connection
+async def get_table_cfg(conn_obj=None, sql_file_name='get_table_info.sql', user=None, table=None):
+    """
+    Create a config dictionary suitable for configuring martin vector tile service
+     for a given table located  in  a database defined by conn_obj or conn_dict
+    :param: conn_obj, instance of asyncpg.connection
+    :param sql_file_name: str, the name of the SQL template that fetches the geometry column, attribute columns,
+            column comments, privileges of the user, primary key and estimated extent of the table in one round-trip
+    :param user: str, optional, if supplied the table is skipped unless the user can SELECT from it and
+            only the columns the user can SELECT are published
+    :param table: str, fully qualified table name
+    :return: dict with the configuration as per https://github.com/urbica/martin#configuration-file
+    NB: martin support tables/layers with more than one geometry column. This is desirable because
+    the web mercator projection EPSG 3857 should be used for displaying and is not suitable for
+    performing certain spatial computations
+    """
+    schema, table_name = _split_qualified(table)
+
+    logger.info(f'Creating configuration for {table}')
 
-    return {f'{table}:': tbl_dict}
+    try:
+        sql_query = utils.get_sqlfile_content(sql_file_name=sql_file_name)
+        info = await conn_obj.fetchrow(sql_query, schema, table_name, user or None)
+    except Exception as e:
+        logger.error(
+            f'Failed to fetch columns and bounding box for {table} because {e}. Skipping...')
+        return
+    if info is None:
+        logger.info(
+            f'Skipping table {table}. No columns detected')
+        return
+    col_privileges = None
+    if user:
+        if info['table_accessible'] is False:
+            logger.info(f'{table} was marked as not publishable and will be skipped')
+            return
+        col_privileges = load_json(info['column_privileges']) or {}
+    return {table: build_table_cfg(table=table, record=info, col_privileges=col_privileges)}
 
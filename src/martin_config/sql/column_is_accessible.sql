@@ -1 +1 @@
-SELECT pg_catalog.has_column_privilege('{user}', '{table}', '{column}', 'SELECT') as "select";
\ No newline at end of file
+SELECT pg_catalog.has_column_privilege($1::text, $2::text, $3::text, 'SELECT') as "select";
\ No newline at end of file
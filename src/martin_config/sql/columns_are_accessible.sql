@@ -0,0 +1,2 @@
+SELECT col AS column_name, pg_catalog.has_column_privilege($1::text, $2::text, col, 'SELECT') AS "select"
+FROM unnest($3::text[]) AS col;
\ No newline at end of file
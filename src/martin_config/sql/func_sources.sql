@@ -1,12 +1,15 @@
 SELECT
     n.nspname AS function_schema,
     p.proname AS function_name,
-	array_to_string(p.proargnames, '') AS func_args
+	array_to_string(p.proargnames, '') AS func_args,
+    CASE WHEN $2::text IS NULL THEN NULL
+         ELSE has_function_privilege($2::text, p.oid, 'execute')
+    END AS executable
 FROM
     pg_proc p
     LEFT JOIN pg_namespace n ON p.pronamespace = n.oid
 WHERE
-    n.nspname LIKE '{schema}' AND
+    n.nspname LIKE $1::text AND
     n.nspname NOT IN ('pg_catalog', 'information_schema') AND
 	array_to_string(p.proargnames, '') LIKE 'zxyquery_params'
 
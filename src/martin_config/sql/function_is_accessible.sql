@@ -1,3 +1,3 @@
-SELECT has_function_privilege('{user}', oid::regproc, 'execute') as execute
+SELECT has_function_privilege($1::text, oid::regproc, 'execute') as execute
 FROM pg_proc
-WHERE proname = '{function_name}' AND pronamespace::regnamespace::text = '{schema}';
+WHERE proname = $2::text AND pronamespace::regnamespace::text = $3::text;
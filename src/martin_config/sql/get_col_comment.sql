@@ -1,11 +1,6 @@
-SELECT
-pgd.description FROM pg_catalog.pg_statio_all_tables AS st
-INNER JOIN pg_catalog.pg_description pgd ON (pgd.objoid=st.relid)
-INNER JOIN information_schema.columns c ON
-    (pgd.objsubid=c.ordinal_position AND
-        c.table_schema=st.schemaname AND
-        c.table_name=st.relname AND
-        c.table_name = '{table_name}' AND
-        c.table_schema = '{schema}' AND
-        c.column_name = '{column}'
-    );
\ No newline at end of file
+SELECT d.description
+FROM pg_catalog.pg_description d
+JOIN pg_catalog.pg_class c ON c.oid = d.objoid AND d.classoid = 'pg_catalog.pg_class'::regclass
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+JOIN pg_catalog.pg_attribute a ON a.attrelid = c.oid AND a.attnum = d.objsubid
+WHERE n.nspname = $1 AND c.relname = $2 AND a.attname = $3;
\ No newline at end of file
@@ -0,0 +1,9 @@
+SELECT a.attname AS column_name, d.description
+FROM pg_catalog.pg_attribute a
+JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+LEFT JOIN pg_catalog.pg_description d ON
+    d.objoid = c.oid AND
+    d.classoid = 'pg_catalog.pg_class'::regclass AND
+    d.objsubid = a.attnum
+WHERE n.nspname = $1 AND c.relname = $2 AND a.attnum > 0 AND NOT a.attisdropped;
\ No newline at end of file
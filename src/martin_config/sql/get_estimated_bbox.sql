@@ -1,13 +1,6 @@
- WITH bbox AS (
-     SELECT ST_Transform(
- 			ST_SetSRID(
- 				ST_EstimatedExtent('{schema}', '{table_name}', '{geom_column}'), {srid}),
- 			4326)
- 	as extent
- )
- SELECT
-     ST_Xmin(bbox.extent) as xmin,
-     ST_Ymin(bbox.extent) as ymin,
-     ST_Xmax(bbox.extent) as xmax,
-     ST_Ymax(bbox.extent) as ymax
- FROM bbox;
\ No newline at end of file
+SELECT
+    ST_Xmin(extent) as xmin,
+    ST_Ymin(extent) as ymin,
+    ST_Xmax(extent) as xmax,
+    ST_Ymax(extent) as ymax
+FROM ST_Transform(ST_SetSRID(ST_EstimatedExtent($1::text, $2::text, $3::text), $4::integer), 4326) AS extent;
\ No newline at end of file
@@ -14,12 +14,12 @@ SELECT
     f_table_schema as schema, f_table_name as table_name, f_geometry_column as geom_column, srid, type,
     COALESCE(
           jsonb_object_agg(columns.column_name, columns.type_name) FILTER (WHERE columns.column_name IS NOT NULL AND columns.type_name NOT LIKE '%geometry%'),
-          '{{}}'::jsonb
+          '{}'::jsonb
     ) as properties
 FROM geometry_columns
 LEFT JOIN columns ON
       geometry_columns.f_table_schema = columns.table_schema AND
       geometry_columns.f_table_name = columns.table_name AND
       geometry_columns.f_geometry_column != columns.column_name
-WHERE columns.table_schema = '{schema}' AND columns.table_name = '{table_name}'
+WHERE columns.table_schema = $1::text AND columns.table_name = $2::text
 GROUP BY f_table_schema, f_table_name, f_geometry_column, srid, type;
\ No newline at end of file
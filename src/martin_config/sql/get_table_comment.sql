@@ -1 +1 @@
-SELECT obj_description('{table}'::regclass) AS comment;
\ No newline at end of file
+SELECT obj_description(to_regclass($1::text), 'pg_class') AS comment;
\ No newline at end of file
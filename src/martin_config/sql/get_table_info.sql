@@ -0,0 +1,53 @@
+WITH geom AS (
+    -- prefer the 3857 and then the 4326 geometry column when the table has more than one
+    SELECT f_geometry_column AS geom_column, srid, type
+    FROM geometry_columns
+    WHERE f_table_schema = $1::text AND f_table_name = $2::text
+    ORDER BY srid = 3857 DESC, srid = 4326 DESC, f_geometry_column
+    LIMIT 1
+), columns AS (
+    SELECT
+        attr.attname AS column_name,
+        trim(leading '_' from tp.typname) AS type_name,
+        col_description(attr.attrelid, attr.attnum) AS comment,
+        CASE WHEN $3::text IS NULL THEN NULL
+             ELSE pg_catalog.has_column_privilege($3::text, class.oid, attr.attnum, 'SELECT')
+        END AS accessible
+    FROM pg_catalog.pg_attribute attr
+        JOIN pg_catalog.pg_class AS class ON class.oid = attr.attrelid
+        JOIN pg_catalog.pg_namespace AS ns ON ns.oid = class.relnamespace
+        JOIN pg_catalog.pg_type AS tp ON tp.oid = attr.atttypid
+    WHERE ns.nspname = $1::text AND class.relname = $2::text AND NOT attr.attisdropped AND attr.attnum > 0
+), primary_key AS (
+    SELECT attr.attname AS column_name, format_type(attr.atttypid, attr.atttypmod) AS data_type
+    FROM pg_catalog.pg_index AS idx
+        JOIN pg_catalog.pg_attribute AS attr ON attr.attrelid = idx.indrelid AND attr.attnum = ANY(idx.indkey)
+    WHERE idx.indisprimary AND idx.indrelid = to_regclass(quote_ident($1::text) || '.' || quote_ident($2::text))
+    -- same column as schema_introspect.sql for composite keys
+    ORDER BY attr.attnum
+    LIMIT 1
+)
+SELECT
+    geom.geom_column, geom.srid, geom.type,
+    COALESCE(
+        (SELECT jsonb_object_agg(column_name, type_name) FROM columns WHERE type_name NOT LIKE '%geometry%'),
+        '{}'::jsonb
+    ) AS properties,
+    COALESCE(
+        (SELECT jsonb_object_agg(column_name, comment) FROM columns WHERE comment IS NOT NULL),
+        '{}'::jsonb
+    ) AS comments,
+    (SELECT jsonb_object_agg(column_name, accessible) FROM columns WHERE $3::text IS NOT NULL) AS column_privileges,
+    CASE WHEN $3::text IS NULL THEN NULL
+         ELSE pg_catalog.has_table_privilege($3::text, to_regclass(quote_ident($1::text) || '.' || quote_ident($2::text)), 'SELECT')
+    END AS table_accessible,
+    (SELECT column_name FROM primary_key) AS pkey_column,
+    (SELECT data_type FROM primary_key) AS pkey_type,
+    ST_Xmin(bbox.extent) AS xmin,
+    ST_Ymin(bbox.extent) AS ymin,
+    ST_Xmax(bbox.extent) AS xmax,
+    ST_Ymax(bbox.extent) AS ymax
+FROM geom
+CROSS JOIN LATERAL (
+    SELECT ST_Transform(ST_SetSRID(ST_EstimatedExtent($1::text, $2::text, geom.geom_column::text), geom.srid), 4326) AS extent
+) AS bbox;
\ No newline at end of file
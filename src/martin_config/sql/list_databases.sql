@@ -1 +1 @@
-SELECT datname FROM pg_database WHERE datistemplate = FALSE;
\ No newline at end of file
+SELECT datname FROM pg_database WHERE NOT datistemplate;
\ No newline at end of file
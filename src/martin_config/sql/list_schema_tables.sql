@@ -1 +1,2 @@
-SELECT * FROM pg_catalog.pg_tables WHERE schemaname = '{schema}';
\ No newline at end of file
+SELECT schemaname, tablename, obj_description(format('%I.%I', schemaname, tablename)::regclass, 'pg_class') AS comment
+FROM pg_catalog.pg_tables WHERE schemaname = $1::text;
\ No newline at end of file
@@ -1 +1,4 @@
-SELECT schema_name FROM information_schema.schemata;
\ No newline at end of file
+SELECT schema_name FROM information_schema.schemata
+WHERE schema_name NOT IN ('information_schema', 'pg_catalog')
+    AND schema_name NOT LIKE 'pg\_toast%'
+    AND schema_name NOT LIKE 'pg\_temp\_%';
\ No newline at end of file
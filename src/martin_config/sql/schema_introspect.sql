@@ -0,0 +1,64 @@
+WITH geom AS (
+    -- one geometry column per table, 3857 first, then 4326, then the first column by name
+    SELECT DISTINCT ON (g.f_table_name) g.f_table_name::text AS table_name, g.f_geometry_column AS geom_column, g.srid, g.type
+    FROM geometry_columns AS g
+        JOIN pg_catalog.pg_tables AS t ON t.schemaname = g.f_table_schema AND t.tablename = g.f_table_name
+    WHERE g.f_table_schema = $1::text
+    ORDER BY g.f_table_name, g.srid = 3857 DESC, g.srid = 4326 DESC, g.f_geometry_column
+), columns AS (
+    SELECT
+        class.relname::text AS table_name,
+        attr.attname AS column_name,
+        trim(leading '_' from tp.typname) AS type_name,
+        col_description(attr.attrelid, attr.attnum) AS comment,
+        CASE WHEN $2::text IS NULL THEN NULL
+             ELSE pg_catalog.has_column_privilege($2::text, class.oid, attr.attnum, 'SELECT')
+        END AS accessible
+    FROM pg_catalog.pg_attribute attr
+        JOIN pg_catalog.pg_class AS class ON class.oid = attr.attrelid
+        JOIN pg_catalog.pg_namespace AS ns ON ns.oid = class.relnamespace
+        JOIN pg_catalog.pg_type AS tp ON tp.oid = attr.atttypid
+    WHERE ns.nspname = $1::text AND class.relkind IN ('r', 'p') AND NOT attr.attisdropped AND attr.attnum > 0
+), primary_key AS (
+    SELECT DISTINCT ON (class.relname) class.relname::text AS table_name, attr.attname AS column_name,
+        format_type(attr.atttypid, attr.atttypmod) AS data_type
+    FROM pg_catalog.pg_index AS idx
+        JOIN pg_catalog.pg_class AS class ON class.oid = idx.indrelid
+        JOIN pg_catalog.pg_namespace AS ns ON ns.oid = class.relnamespace
+        JOIN pg_catalog.pg_attribute AS attr ON attr.attrelid = idx.indrelid AND attr.attnum = ANY(idx.indkey)
+    WHERE idx.indisprimary AND ns.nspname = $1::text
+    ORDER BY class.relname, attr.attnum
+)
+SELECT
+    geom.table_name, geom.geom_column, geom.srid, geom.type,
+    COALESCE(
+        (SELECT jsonb_object_agg(c.column_name, c.type_name) FROM columns AS c
+         WHERE c.table_name = geom.table_name AND c.type_name NOT LIKE '%geometry%'),
+        '{}'::jsonb
+    ) AS properties,
+    COALESCE(
+        (SELECT jsonb_object_agg(c.column_name, c.comment) FROM columns AS c
+         WHERE c.table_name = geom.table_name AND c.comment IS NOT NULL),
+        '{}'::jsonb
+    ) AS comments,
+    (SELECT jsonb_object_agg(c.column_name, c.accessible) FROM columns AS c
+     WHERE c.table_name = geom.table_name AND $2::text IS NOT NULL) AS column_privileges,
+    obj_description(tbl.oid, 'pg_class') AS table_comment,
+    CASE WHEN $2::text IS NULL THEN NULL
+         ELSE pg_catalog.has_table_privilege($2::text, tbl.oid, 'SELECT')
+    END AS table_accessible,
+    pk.column_name AS pkey_column,
+    pk.data_type AS pkey_type,
+    ST_Xmin(bbox.extent) AS xmin,
+    ST_Ymin(bbox.extent) AS ymin,
+    ST_Xmax(bbox.extent) AS xmax,
+    ST_Ymax(bbox.extent) AS ymax
+FROM geom
+CROSS JOIN LATERAL (
+    SELECT to_regclass(quote_ident($1::text) || '.' || quote_ident(geom.table_name)) AS oid
+) AS tbl
+LEFT JOIN primary_key AS pk ON pk.table_name = geom.table_name
+CROSS JOIN LATERAL (
+    SELECT ST_Transform(ST_SetSRID(ST_EstimatedExtent($1::text, geom.table_name, geom.geom_column::text), geom.srid), 4326) AS extent
+) AS bbox
+ORDER BY geom.table_name;
\ No newline at end of file
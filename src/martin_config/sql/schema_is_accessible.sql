@@ -1 +1 @@
-SELECT pg_catalog.has_schema_privilege('{user}', '{schema}', 'USAGE') as "usage";
\ No newline at end of file
+SELECT pg_catalog.has_schema_privilege($1::text, $2::text, 'USAGE') as "usage";
\ No newline at end of file
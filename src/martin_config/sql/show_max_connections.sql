@@ -0,0 +1 @@
+SHOW max_connections;
\ No newline at end of file
@@ -1 +1 @@
-SELECT * from {table} LIMIT 0;
\ No newline at end of file
+SELECT to_regclass($1::text) IS NOT NULL AS exists;
\ No newline at end of file
@@ -1 +1 @@
-SELECT pg_catalog.has_table_privilege('{user}', '{table}', 'SELECT') as "select";
\ No newline at end of file
+SELECT pg_catalog.has_table_privilege($1::text, $2::text, 'SELECT') as "select";
\ No newline at end of file
@@ -1,31 +1,92 @@
 import os.path
+import re
+import copy
+import functools
+from collections import OrderedDict
 import yaml
 from pathlib import Path
 try:
-    import urlparse
+    from yaml import CSafeDumper as SafeDumper, CSafeLoader as SafeLoader
 except ImportError:
-    import urllib.parse as urlparse
-from urllib.parse import quote_plus, urlencode
+    from yaml import SafeDumper, SafeLoader
+from urllib.parse import parse_qsl, quote_plus, unquote, urlsplit
 
 
 
 CWD = Path(__file__).parent
+SQL_DIR = CWD / 'sql'
 POOL_COMMAND_TIMEOUT = 15 * 60  # seconds
 POOL_MINSIZE = 3
-POOL_MAXSIZE = 5
+POOL_MAXSIZE = 10
 CONNECTION_TIMEOUT = 30
+# the parameterized templates fit comfortably, the statements are kept for the life of the connection
+STATEMENT_CACHE_SIZE = 32
+STATEMENT_LIFETIME = 0
+# the catalog queries are short, JIT compiling them costs more than it saves
+SERVER_SETTINGS = {'jit': 'off'}
+# percent-encoded slash of unix socket paths given as host
+_PCT2F_RE = re.compile('%2f', re.IGNORECASE)
+# connection string components that quote_plus leaves as they are
+_SAFE_RE = re.compile(r'[A-Za-z0-9_.\-]+\Z')
+# parsed config files keyed by path, see read_conf
+_CONF_CACHE = OrderedDict()
+CONF_CACHE_MAXSIZE = 100
+CONF_READ_BUFFER = 1 << 20
+
+
+class ConfigDumper(SafeDumper):
+    """
+    Safe YAML dumper (libyaml backed when available) that writes sequences
+    in flow style and None as ~ like martin's own config files
+    """
+
+
+ConfigDumper.add_representer(
+    list, lambda dumper, data: dumper.represent_sequence('tag:yaml.org,2002:seq', data, flow_style=True))
+ConfigDumper.add_representer(
+    type(None), lambda dumper, data: dumper.represent_scalar('tag:yaml.org,2002:null', '~'))
+
+def _load_sql_templates():
+    """
+    Read all the SQL files shipped in the sql folder of the package
+    :return: dict mapping the file names to their content
+    """
+    try:
+        from importlib.resources import files
+        sql_dir = files('martin_config').joinpath('sql')
+    except ImportError:
+        # python < 3.9
+        sql_dir = SQL_DIR
+    return {p.name: p.read_text(encoding='utf-8') for p in sql_dir.iterdir() if p.name.endswith('.sql')}
+
+
+# the files ship with the package and never change, they are all read once at import
+SQL_TEMPLATES = _load_sql_templates()
+
 
 def get_sqlfile_content(sql_file_name=None):
     """
-    Reda the content of a SQL file from sql folder
+    Fetch the content of a SQL file from sql folder.
     :param sql_file_name:
     :return: str, the content of the SQL file, as is
+    NB raises FileNotFoundError if the file does not exist
     """
     assert sql_file_name is not None, f'Invalid sql_file={sql_file_name}'
-    sql_file_path = os.path.join(CWD, 'sql', sql_file_name)
-    assert os.path.exists(sql_file_path), f'{sql_file_path} does not exist'
-    with open(sql_file_path) as f:
-        return f.read()
+    try:
+        return SQL_TEMPLATES[sql_file_name]
+    except KeyError:
+        raise FileNotFoundError(f'{SQL_DIR / sql_file_name} does not exist') from None
+
+
+def _quote(value=None):
+    """
+    quote_plus a connection string component, the common user/host/option values need no encoding
+    :param value: str
+    :return: str
+    """
+    if _SAFE_RE.match(value):
+        return value
+    return quote_plus(value)
 
 
 def cd2s(user=None, password=None, host=None, port=None, database=None, **kwargs):
@@ -40,12 +101,11 @@ def cd2s(user=None, password=None, host=None, port=None, database=None, **kwargs
     :return:
     """
     if 'ssl' in kwargs:
-        kwargs['sslmode'] = kwargs['ssl']
-        del kwargs['ssl']
-    try:
-        return f'postgres://{quote_plus(user)}:{quote_plus(password)}@{quote_plus(host)}:{port}/{database}?{urlencode(kwargs)}'
-    except KeyError:
-        raise
+        kwargs['sslmode'] = kwargs.pop('ssl')
+    dsn = f'postgres://{_quote(user)}:{_quote(password)}@{_quote(host)}:{port}/{database}'
+    if not kwargs:
+        return dsn
+    return f'{dsn}?{"&".join(f"{_quote(k)}={_quote(str(v))}" for k, v in kwargs.items())}'
 
 
 def cs2d(url=None):
@@ -54,70 +114,72 @@ def cs2d(url=None):
     :param url:
     :return:
     """
+    # every call gets its own dict, the values are immutable so a shallow copy is enough
+    return dict(_cs2d(url=url))
 
-    # otherwise parse the url as normal
-    config = {}
-
-    url = urlparse.urlparse(url)
 
-    # Split query strings from path.
-    path = url.path[1:]
-    if '?' in path and not url.query:
-        path, query = path.split('?', 2)
-    else:
-        path, query = path, url.query
+@functools.lru_cache(maxsize=128)
+def _cs2d(url=None):
+    """
+    Parse a connection string once, the same few strings are converted on every connection setup
+    :param url:
+    :return: tuple of (key, value) pairs
+    """
+    url = urlsplit(url)
+    query = url.query
 
     # Handle postgres percent-encoded paths.
     hostname = url.hostname or ''
-    if '%2f' in hostname.lower():
+    if _PCT2F_RE.search(hostname):
         # Switch to url.netloc to avoid lower cased paths
         hostname = url.netloc
         if "@" in hostname:
             hostname = hostname.rsplit("@", 1)[1]
         if ":" in hostname:
             hostname = hostname.split(":", 1)[0]
-        hostname = hostname.replace('%2f', '/').replace('%2F', '/')
-
-    port = url.port
-    if query:
-        if 'sslmode' in query:
-            query = query.replace('sslmode', 'ssl')
-        d = dict(urlparse.parse_qsl(query))
-
-        config.update(d)
-
-    # Update with environment configuration.
-    config.update({
-        'database': urlparse.unquote(path or ''),
-        'user': urlparse.unquote(url.username or ''),
-        'password': urlparse.unquote(url.password or ''),
-        'host': hostname,
-        'port': port or '',
-
-    })
-
-    return config
+        hostname = unquote(hostname)
+
+    config = dict(parse_qsl(query)) if query else {}
+    # rename the key only, values containing sslmode stay as they are
+    if 'sslmode' in config:
+        config['ssl'] = config.pop('sslmode')
+    config['database'] = unquote(url.path[1:])
+    config['user'] = unquote(url.username or '')
+    config['password'] = unquote(url.password or '')
+    config['host'] = hostname
+    config['port'] = url.port or ''
+    return tuple(config.items())
 
 def read_conf(path=None):
-    with open(path) as f:
-        return yaml.full_load(f)
-
-
-def dump(input_dict, depth=0, content=[]):
     """
-    Recursively dumps a dictionary with the configuration into YAML format
+    Read a YAML config file.
+    The parsed content is cached and reused as long as the modification time and size of the file do not change
+    :param path: str, the path to the file
+    :return: the parsed content, plain YAML types only. Every call returns a new copy that can be modified freely
+    """
+    st = os.stat(path)
+    key = str(path)
+    entry = _CONF_CACHE.get(key)
+    if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+        _CONF_CACHE.move_to_end(key)
+    else:
+        # binary mode, the loader detects and decodes the encoding itself (in C with libyaml)
+        # large configs are read from disk in 1 MiB chunks, smaller ones in one read
+        with open(path, 'rb', buffering=CONF_READ_BUFFER) as f:
+            entry = st.st_mtime_ns, st.st_size, yaml.load(f, Loader=SafeLoader)
+        _CONF_CACHE[key] = entry
+        if len(_CONF_CACHE) > CONF_CACHE_MAXSIZE:
+            _CONF_CACHE.popitem(last=False)
+    # the cached object stays pristine, callers get their own copy
+    return copy.deepcopy(entry[2])
+
+
+def dump(input_dict, stream=None):
+    """
+    Dumps a dictionary with the configuration into YAML format
     :param input_dict: dict, input
-    :param depth: int, default=0, the depth of each line/elemnt in the dictionary. Use to insert \t characters
-    :param content: the content created/passed in at every recursion
-    :return:
+    :param stream: file like object, optional. If supplied the YAML is written straight into it
+    :return: str, the YAML document or None if a stream was supplied
     """
-    spacer = ''.join(depth * [' '])
     if input_dict:
-        for k, v in input_dict.items():
-            if isinstance(v, dict):
-                content.append(f'{spacer}{k}')
-                dump(v, depth=depth + 2, content=content)
-            else:
-                content.append(
-                    f'{spacer}{k}: {str(v).lower() if type(v) is bool else v}')
-        return '\n'.join(content)
+        return yaml.dump(input_dict, stream=stream, Dumper=ConfigDumper, sort_keys=False, default_flow_style=False)